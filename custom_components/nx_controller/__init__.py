@@ -1,15 +1,17 @@
 """NxController integration entry point."""
 from __future__ import annotations
 
+import asyncio
 import logging
 from dataclasses import dataclass, field, replace
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_PASSWORD, CONF_PORT, CONF_USERNAME, Platform
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.core import HomeAssistant, ServiceCall, callback
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.storage import Store
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
@@ -22,21 +24,32 @@ from .const import (
     DEFAULT_PORT,
     DOMAIN,
     EVENT_NEW_MAC_DETECTED,
+    LAST_SEEN_RESOLUTION,
     SERVICE_MAP_MAC,
     STORAGE_KEY,
+    STORAGE_SAVE_DELAY,
     STORAGE_VERSION,
 )
+from . import ssh_pool
 from .ssh_client import (
-    NxSSHClient,
+    DHCP_HOSTS_COMMAND,
+    DHCP_LEASES_COMMAND,
+    NEIGHBORS_COMMAND,
+    ODHCPD_LEASES_COMMAND,
+    NeighborEntry,
     NxSSHError,
     normalize_mac,
+    parse_dhcp_hosts,
+    parse_dhcp_leases,
+    parse_neighbors,
+    parse_odhcpd_leases,
     utcnow_iso,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class NxClient:
     """Normalized representation of a network client."""
 
@@ -56,19 +69,79 @@ class NxClient:
     online: bool = False
 
 
+def _storage_key(entry_id: str) -> str:
+    return f"{STORAGE_KEY}_{entry_id}"
+
+
+async def _async_migrate_legacy_storage(hass: HomeAssistant) -> None:
+    """Split the MAC mapping formerly shared by all entries into per-entry files."""
+
+    legacy = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    data = await legacy.async_load()
+    if data is None:
+        return
+    devices: Dict[str, Dict[str, object]] = data.get("devices", {})
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        store = Store(hass, STORAGE_VERSION, _storage_key(entry.entry_id))
+        if await store.async_load() is not None:
+            continue
+        alias = entry.data[CONF_ALIAS]
+        await store.async_save(
+            {
+                "version": STORAGE_VERSION,
+                "devices": {
+                    primary: info for primary, info in devices.items() if info.get("alias") == alias
+                },
+            }
+        )
+    await legacy.async_remove()
+
+
 class DeviceRegistry:
     """Persistence for mapping dynamic MACs to primary MACs."""
 
-    def __init__(self, hass: HomeAssistant) -> None:
-        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store = Store(hass, STORAGE_VERSION, _storage_key(entry_id))
         self.devices: Dict[str, Dict[str, object]] = {}
+        self._mac_index: Dict[Tuple[str, str], str] = {}
+        self._dirty = False
 
     async def async_load(self) -> None:
         data = await self._store.async_load() or {}
         self.devices = data.get("devices", {})
+        for info in self.devices.values():
+            metadata: Dict[str, object] = info.get("metadata") or {}  # type: ignore[assignment]
+            if "hostname" in metadata:
+                metadata["hostname"] = self._normalize_hostname(metadata["hostname"])  # type: ignore[arg-type]
+        self._mac_index = {}
+        for primary, info in self.devices.items():
+            macs = dict.fromkeys(
+                normalized for normalized in map(normalize_mac, info.get("macs", [])) if normalized
+            )
+            if primary not in macs:
+                macs = {primary: None, **macs}
+            info["macs"] = list(macs)
+            for mac in info["macs"]:
+                self._mac_index.setdefault((info.get("alias"), mac), primary)  # type: ignore[index]
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
 
     async def async_save(self) -> None:
-        await self._store.async_save({"version": STORAGE_VERSION, "devices": self.devices})
+        self._dirty = False
+        await self._store.async_save(self._data_to_save())
+
+    @callback
+    def async_schedule_save(self) -> None:
+        """Coalesce pending changes into a single delayed write."""
+
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    def _data_to_save(self) -> Dict[str, object]:
+        return {"version": STORAGE_VERSION, "devices": self.devices}
 
     def _normalize_hostname(self, hostname: Optional[str]) -> Optional[str]:
         if not hostname:
@@ -77,26 +150,22 @@ class DeviceRegistry:
         return normalized.lower() or None
 
     def get_primary_for_mac(self, alias: str, mac: str) -> Optional[str]:
-        for primary, info in self.devices.items():
-            if info.get("alias") != alias:
-                continue
-            if mac in info.get("macs", []):
-                return primary
-        return None
+        return self._mac_index.get((alias, mac))
 
     def _update_metadata(self, info: Dict[str, object], hostname: Optional[str], ipv4: Optional[str]) -> None:
         metadata: Dict[str, object] = info.setdefault("metadata", {})  # type: ignore[arg-type]
         normalized_hostname = self._normalize_hostname(hostname)
-        if normalized_hostname:
+        if normalized_hostname and metadata.get("hostname") != normalized_hostname:
             metadata["hostname"] = normalized_hostname
-        if ipv4:
+            self._dirty = True
+        if ipv4 and metadata.get("ipv4") != ipv4:
             metadata["ipv4"] = ipv4
+            self._dirty = True
 
-    def ensure_device(self, alias: str, mac: str, hostname: Optional[str], ipv4: Optional[str]) -> str:
-        existing = self.get_primary_for_mac(alias, mac)
-        if existing:
-            return existing
+    def _add_device(self, alias: str, mac: str, hostname: Optional[str], ipv4: Optional[str]) -> str:
         self.devices[mac] = {"alias": alias, "macs": [mac], "metadata": {}}
+        self._mac_index[(alias, mac)] = mac
+        self._dirty = True
         self._update_metadata(self.devices[mac], hostname, ipv4)
         return mac
 
@@ -109,9 +178,10 @@ class DeviceRegistry:
         alt_primary = self.get_primary_for_mac(alias, alt_mac)
         if alt_primary and alt_primary != primary_mac:
             alt_info = self.devices.pop(alt_primary)
-            for mac in alt_info.get("macs", []):
-                if mac not in primary["macs"]:
-                    primary["macs"].append(mac)
+            alt_macs = alt_info.get("macs", [])
+            primary["macs"] = list(dict.fromkeys([*primary["macs"], *alt_macs]))
+            for mac in alt_macs:
+                self._mac_index[(alias, mac)] = primary_mac
             self._update_metadata(
                 primary,
                 alt_info.get("metadata", {}).get("hostname"),
@@ -119,6 +189,8 @@ class DeviceRegistry:
             )
         if alt_mac not in primary["macs"]:
             primary["macs"].append(alt_mac)
+        self._mac_index[(alias, alt_mac)] = primary_mac
+        self._dirty = True
 
     def find_by_identity(self, alias: str, hostname: Optional[str], ipv4: Optional[str]) -> Optional[str]:
         """Find primary device matching hostname and IPv4 rules."""
@@ -132,7 +204,7 @@ class DeviceRegistry:
             if info.get("alias") != alias:
                 continue
             metadata: Dict[str, object] = info.get("metadata", {})  # type: ignore[arg-type]
-            stored_hostname = self._normalize_hostname(metadata.get("hostname"))
+            stored_hostname = metadata.get("hostname")
             stored_ipv4 = metadata.get("ipv4")
 
             if target_hostname:
@@ -165,8 +237,23 @@ class DeviceRegistry:
             self._update_metadata(self.devices[identity_primary], hostname, ipv4)
             return identity_primary, True
 
-        primary = self.ensure_device(alias, mac, hostname, ipv4)
-        return primary, True
+        return self._add_device(alias, mac, hostname, ipv4), True
+
+
+def _parse_batch(
+    outputs: List[str],
+) -> Tuple[List[NeighborEntry], List[Dict[str, str]], List[Dict[str, str]], List[Dict[str, str]]]:
+    """Parse the neighbour and optional DHCP outputs of one poll."""
+
+    neighbors = parse_neighbors(outputs[0])
+    if len(outputs) == 1:
+        return neighbors, [], [], []
+    return (
+        neighbors,
+        parse_dhcp_hosts(outputs[1]),
+        parse_dhcp_leases(outputs[2]),
+        parse_odhcpd_leases(outputs[3]),
+    )
 
 
 class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
@@ -177,7 +264,15 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
         self.registry = registry
         self.alias = entry.data[CONF_ALIAS]
         self.is_dhcp_server = entry.data.get(CONF_IS_DHCP_SERVER, False)
-        self.client = NxSSHClient(
+        self.clients_changed = True
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, f"router_{self.alias}")},
+            name=self.alias,
+            manufacturer="OpenWrt",
+            model="NxController",
+        )
+        self.client = ssh_pool.async_acquire(
+            hass,
             entry.data[CONF_HOST],
             entry.data.get(CONF_PORT, DEFAULT_PORT),
             entry.data[CONF_USERNAME],
@@ -188,34 +283,37 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
             _LOGGER,
             name=f"{DOMAIN}_{self.alias}",
             update_interval=DEFAULT_SCAN_INTERVAL,
+            always_update=False,
         )
 
     async def _async_update_data(self) -> Dict[str, NxClient]:
         previous_clients: Dict[str, NxClient] = self.data or {}
         clients: Dict[str, NxClient] = {}
         try:
-            hosts = await self.client.async_get_dhcp_hosts() if self.is_dhcp_server else []
-            dhcp_v4 = await self.client.async_get_dhcp_leases() if self.is_dhcp_server else []
-            dhcp_v6 = await self.client.async_get_odhcpd_leases() if self.is_dhcp_server else []
-            neighbors = await self.client.async_get_neighbors()
-            wifi_interfaces = await self.client.async_get_wifi_interfaces()
-            wifi_clients: List[dict] = []
-            for iface in wifi_interfaces:
-                assoc = await self.client.async_get_wifi_clients(iface)
-                for item in assoc:
-                    wifi_clients.append({"mac": item.mac, "interface": item.interface, "signal": item.signal_dbm})
+            commands = [NEIGHBORS_COMMAND]
+            if self.is_dhcp_server:
+                commands += [DHCP_HOSTS_COMMAND, DHCP_LEASES_COMMAND, ODHCPD_LEASES_COMMAND]
+            outputs, wifi_interfaces = await asyncio.gather(
+                self.client.async_run_batch(commands),
+                self.client.async_get_wifi_interfaces(),
+            )
+            wifi_clients: List[dict] = [
+                {"mac": item.mac, "interface": item.interface, "signal": item.signal_dbm}
+                for item in await self.client.async_get_wifi_clients(wifi_interfaces)
+            ]
         except NxSSHError as err:
             raise UpdateFailed(str(err)) from err
 
-        def register_client(mac: str, data: dict) -> None:
-            normalized_mac = normalize_mac(mac)
-            if not normalized_mac:
-                return
+        neighbors, hosts, dhcp_v4, dhcp_v6 = await self.hass.async_add_executor_job(
+            _parse_batch, outputs
+        )
 
+        def register_client(mac: str, data: dict) -> None:
+            # Parsers only emit MACs that already went through normalize_mac.
             hostname: Optional[str] = (data.get("hostname") or "").strip() or None
             ipv4: Optional[str] = data.get("ipv4") or data.get("ip")
 
-            primary, is_new = self.registry.map_mac(self.alias, normalized_mac, hostname, ipv4)
+            primary, is_new = self.registry.map_mac(self.alias, mac, hostname, ipv4)
 
             client = clients.get(primary)
             if not client:
@@ -225,7 +323,7 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
                 else:
                     client = NxClient(primary_mac=primary, alias=self.alias, macs=set())
                 clients[primary] = client
-            client.macs.add(normalized_mac)
+            client.macs.add(mac)
             if hostname:
                 client.hostname = hostname
             if ipv4:
@@ -254,7 +352,7 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
                     EVENT_NEW_MAC_DETECTED,
                     {
                         "alias": self.alias,
-                        "mac": normalized_mac,
+                        "mac": mac,
                         "ipv4": client.ipv4,
                         "ipv6": client.ipv6,
                         "hostname": client.hostname,
@@ -262,6 +360,8 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
                     },
                 )
 
+        now = utcnow_iso(LAST_SEEN_RESOLUTION)
+
         for entry in hosts:
             register_client(
                 entry["mac"],
@@ -270,7 +370,7 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
                     "ipv4": entry.get("ip"),
                     "dhcp_source": entry.get("source"),
                     "online": False,
-                    "last_seen": utcnow_iso(),
+                    "last_seen": now,
                 },
             )
 
@@ -282,7 +382,7 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
                     "ipv4": lease.get("ip"),
                     "dhcp_source": lease.get("source"),
                     "online": False,
-                    "last_seen": utcnow_iso(),
+                    "last_seen": now,
                 },
             )
 
@@ -294,7 +394,7 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
                     "ipv6": lease.get("ipv6"),
                     "dhcp_source": lease.get("source"),
                     "online": False,
-                    "last_seen": utcnow_iso(),
+                    "last_seen": now,
                 },
             )
 
@@ -308,7 +408,7 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
                     if neighbor.interface and not neighbor.interface.startswith("wl")
                     else None,
                     "online": True,
-                    "last_seen": utcnow_iso(),
+                    "last_seen": now,
                 },
             )
 
@@ -320,11 +420,11 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
                     "connection_type": "wireless",
                     "signal_dbm": wifi.get("signal"),
                     "online": True,
-                    "last_seen": utcnow_iso(),
+                    "last_seen": now,
                 },
             )
 
-        await self.registry.async_save()
+        self.registry.async_schedule_save()
 
         for primary, info in self.registry.devices.items():
             if info.get("alias") != self.alias:
@@ -343,6 +443,7 @@ class NxControllerCoordinator(DataUpdateCoordinator[Dict[str, NxClient]]):
                     online=False,
                 )
 
+        self.clients_changed = clients.keys() != previous_clients.keys()
         return clients
 
 
@@ -350,6 +451,7 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the NxController integration."""
 
     hass.data.setdefault(DOMAIN, {})
+    await _async_migrate_legacy_storage(hass)
 
     async def async_handle_map_mac(call: ServiceCall) -> None:
         alias = call.data[CONF_ALIAS]
@@ -359,7 +461,9 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
             raise ValueError("Invalid MAC provided")
         target_entry_id = None
         for entry_id, data in hass.data[DOMAIN].items():
-            if isinstance(data, NxControllerCoordinator) or "coordinator" in data:
+            if isinstance(data, NxControllerCoordinator) or (
+                isinstance(data, dict) and "coordinator" in data
+            ):
                 coordinator: NxControllerCoordinator = (
                     data if isinstance(data, NxControllerCoordinator) else data["coordinator"]
                 )
@@ -386,7 +490,7 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up NxController from a config entry."""
 
-    registry = DeviceRegistry(hass)
+    registry = DeviceRegistry(hass, entry.entry_id)
     await registry.async_load()
 
     coordinator = NxControllerCoordinator(hass, entry, registry)
@@ -394,6 +498,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     try:
         await coordinator.client.async_run_command("echo NxController")
     except NxSSHError as err:
+        await coordinator.client.close()
         raise ConfigEntryNotReady(str(err)) from err
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
@@ -412,7 +517,14 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     data = hass.data[DOMAIN].get(entry.entry_id)
     if data:
         await data["coordinator"].client.close()
+        await data["registry"].async_save()
     unload_ok = await hass.config_entries.async_unload_platforms(entry, [Platform.SENSOR])
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored MAC mapping of a deleted config entry."""
+
+    await DeviceRegistry(hass, entry.entry_id).async_remove()
@@ -14,7 +14,19 @@ from .const import (
     DEFAULT_PORT,
     DOMAIN,
 )
-from .ssh_client import NxSSHClient, NxSSHError
+from . import ssh_pool
+from .ssh_client import NxSSHError
+
+DATA_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_ALIAS): str,
+        vol.Required(CONF_HOST): str,
+        vol.Optional(CONF_PORT, default=DEFAULT_PORT): int,
+        vol.Required(CONF_USERNAME): str,
+        vol.Required(CONF_PASSWORD): str,
+        vol.Optional(CONF_IS_DHCP_SERVER, default=True): bool,
+    }
+)
 
 
 class NxControllerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -26,37 +38,36 @@ class NxControllerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors = {}
         if user_input is not None:
             alias = user_input[CONF_ALIAS]
-            existing = {
-                entry.data.get(CONF_ALIAS)
-                for entry in self._async_current_entries()
-            }
-            if alias in existing:
+            endpoint = (user_input[CONF_HOST], user_input.get(CONF_PORT, DEFAULT_PORT))
+            aliases = set()
+            endpoints = set()
+            for entry in self._async_current_entries():
+                aliases.add(entry.data.get(CONF_ALIAS))
+                endpoints.add((entry.data.get(CONF_HOST), entry.data.get(CONF_PORT, DEFAULT_PORT)))
+            if alias in aliases:
                 errors["base"] = "alias_exists"
+            elif endpoint in endpoints:
+                errors["base"] = "host_exists"
+            elif not user_input[CONF_HOST].strip() or not user_input[CONF_USERNAME].strip():
+                errors["base"] = "cannot_connect"
             else:
+                client = ssh_pool.async_acquire(
+                    self.hass,
+                    user_input[CONF_HOST],
+                    user_input.get(CONF_PORT, DEFAULT_PORT),
+                    user_input[CONF_USERNAME],
+                    user_input[CONF_PASSWORD],
+                )
                 try:
-                    client = NxSSHClient(
-                        user_input[CONF_HOST],
-                        user_input.get(CONF_PORT, DEFAULT_PORT),
-                        user_input[CONF_USERNAME],
-                        user_input[CONF_PASSWORD],
-                    )
                     await client.async_run_command("echo NxController")
                 except NxSSHError:
+                    await client.close()
                     errors["base"] = "cannot_connect"
                 else:
+                    await ssh_pool.async_release(self.hass, client)
                     return self.async_create_entry(title=alias, data=user_input)
 
-        data_schema = vol.Schema(
-            {
-                vol.Required(CONF_ALIAS): str,
-                vol.Required(CONF_HOST): str,
-                vol.Optional(CONF_PORT, default=DEFAULT_PORT): int,
-                vol.Required(CONF_USERNAME): str,
-                vol.Required(CONF_PASSWORD): str,
-                vol.Optional(CONF_IS_DHCP_SERVER, default=True): bool,
-            }
-        )
-        return self.async_show_form(step_id="user", data_schema=data_schema, errors=errors)
+        return self.async_show_form(step_id="user", data_schema=DATA_SCHEMA, errors=errors)
 
     @callback
     def async_get_options_flow(self):
@@ -66,8 +77,5 @@ class NxControllerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 class NxControllerOptionsFlowHandler(config_entries.OptionsFlow):
     """Options flow placeholder (not used)."""
 
-    def __init__(self) -> None:
-        super().__init__()
-
     async def async_step_init(self, user_input=None):
         return self.async_create_entry(title="", data={})
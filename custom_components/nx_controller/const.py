@@ -8,6 +8,9 @@ NAME = "NxController"
 PLATFORMS = ["sensor"]
 STORAGE_KEY = f"{DOMAIN}_devices"
 STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10
+
+DATA_SSH_POOL = "_ssh_pool"
 
 CONF_ALIAS = "alias"
 CONF_HOST = "host"
@@ -18,6 +21,7 @@ CONF_IS_DHCP_SERVER = "is_dhcp_server"
 
 DEFAULT_PORT = 22
 DEFAULT_SCAN_INTERVAL = timedelta(seconds=60)
+LAST_SEEN_RESOLUTION = timedelta(minutes=5)
 
 EVENT_NEW_MAC_DETECTED = f"{DOMAIN}.new_mac_detected"
 SERVICE_MAP_MAC = "map_mac"
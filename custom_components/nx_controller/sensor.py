@@ -1,13 +1,12 @@
 """Sensor platform for NxController."""
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Dict, List
 
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import entity_registry as er
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
@@ -27,10 +26,10 @@ async def async_setup_entry(
     def _update_entities() -> None:
         if not coordinator.data:
             return
+        if tracked and not coordinator.clients_changed:
+            return
         new_entities: List[NxControllerSensor] = []
-        for primary_mac in coordinator.data:
-            if primary_mac in tracked:
-                continue
+        for primary_mac in coordinator.data.keys() - tracked.keys():
             entity = NxControllerSensor(coordinator, primary_mac)
             tracked[primary_mac] = entity
             new_entities.append(entity)
@@ -55,30 +54,33 @@ class NxControllerSensor(CoordinatorEntity[NxControllerCoordinator], SensorEntit
         slug = f"{self._alias.lower()}_{primary_mac.replace(':', '_').lower()}"
         self.entity_id = f"sensor.{slug}"
         self._attr_suggested_object_id = slug
-
-    @property
-    def _client(self) -> NxClient:
-        return self.coordinator.data[self._primary_mac]
+        self._attr_device_info = coordinator.device_info
+        self._update_from_client(coordinator.data[primary_mac])
 
     @property
     def available(self) -> bool:
         return True
 
-    @property
-    def native_value(self) -> str:
-        return "online" if self._client.online else "offline"
-
     @property
     def name(self) -> str | None:
-        hostname = (self._client.hostname or "").strip()
-        if hostname and hostname.lower() not in {"desconhecido", "unknown"}:
-            return hostname
-        return self.entity_id
+        return self._display_name or self.entity_id
 
-    @property
-    def extra_state_attributes(self) -> Dict[str, Any]:
-        client = self._client
-        return {
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        client = self.coordinator.data.get(self._primary_mac)
+        if client is None or client == self._last_client:
+            return
+        self._update_from_client(client)
+        super()._handle_coordinator_update()
+
+    def _update_from_client(self, client: NxClient) -> None:
+        self._last_client = client
+        hostname = (client.hostname or "").strip()
+        self._display_name = (
+            hostname if hostname and hostname.lower() not in {"desconhecido", "unknown"} else None
+        )
+        self._attr_native_value = "online" if client.online else "offline"
+        self._attr_extra_state_attributes = {
             "mac_address": client.primary_mac,
             "ipv4": client.ipv4,
             "ipv6": client.ipv6,
@@ -93,15 +95,6 @@ class NxControllerSensor(CoordinatorEntity[NxControllerCoordinator], SensorEntit
             "dhcp_source": client.dhcp_source,
         }
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        return DeviceInfo(
-            identifiers={(DOMAIN, f"router_{self._alias}")},
-            name=self._alias,
-            manufacturer="OpenWrt",
-            model="NxController",
-        )
-
     async def async_added_to_hass(self) -> None:
         await super().async_added_to_hass()
 
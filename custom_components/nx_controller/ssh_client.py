@@ -4,19 +4,43 @@ from __future__ import annotations
 import asyncio
 import re
 from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Dict, List, Optional, Set
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 import asyncssh
 
 MAC_REGEX = re.compile(r"([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})")
+MAC_STRICT_REGEX = re.compile(r"[0-9A-Fa-f]{2}(?:[:-][0-9A-Fa-f]{2}){5}")
+HOST_FIELD_REGEX = re.compile(r"host\[(\d+)\]\.([^.]+)")
+SIGNAL_REGEX = re.compile(r"(-?\d+)\s*dBm")
+NEIGHBOR_REGEX = re.compile(
+    r"(?P<ip>[0-9A-Fa-f.:]+)\s+"
+    r"(?:dev\s+(?P<dev>\S+)\s+lladdr\s+(?P<mac>\S+)"
+    r"|0x\S+\s+0x\S+\s+(?P<arp_mac>\S+)\s+\S+\s+(?P<arp_dev>\S+))"
+)
+MAC_SEPARATORS = str.maketrans("-", ":")
+
+DHCP_HOSTS_COMMAND = "uci show dhcp 2>/dev/null || true"
+DHCP_LEASES_COMMAND = "cat /tmp/dhcp.leases 2>/dev/null || true"
+ODHCPD_LEASES_COMMAND = "cat /tmp/odhcpd.leases 2>/dev/null || true"
+NEIGHBORS_COMMAND = "ip neigh show 2>/dev/null || cat /proc/net/arp 2>/dev/null || true"
+IWINFO_COMMAND = "iwinfo 2>/dev/null || true"
+IW_DEV_COMMAND = "iw dev 2>/dev/null || true"
+ASSOCLIST_COMMAND = "iwinfo {interface} assoclist 2>/dev/null || true"
+
+BATCH_SEPARATOR = "__NX_CONTROLLER_BATCH__"
+
+KEEPALIVE_INTERVAL = 30
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
 class NxSSHError(Exception):
     """Raised when SSH operations fail."""
 
 
-@dataclass
+@dataclass(slots=True)
 class WifiClient:
     """Representation of a wireless client."""
 
@@ -25,7 +49,7 @@ class WifiClient:
     signal_dbm: Optional[int]
 
 
-@dataclass
+@dataclass(slots=True)
 class NeighborEntry:
     """Representation of a neighbor entry."""
 
@@ -44,25 +68,32 @@ class NxSSHClient:
         self._password = password
         self._lock = asyncio.Lock()
         self._conn: Optional[asyncssh.SSHClientConnection] = None
+        self._wifi_discovery: Optional[str] = None
+
+    @property
+    def credentials(self) -> Tuple[str, int, str, str]:
+        """Return the connection parameters identifying this client."""
+
+        return (self._host, self._port, self._username, self._password)
 
     async def _ensure_connection(self) -> asyncssh.SSHClientConnection:
-        if self._conn and not self._conn._transport.is_closing():
-            return self._conn
         async with self._lock:
-            if self._conn and not self._conn._transport.is_closing():
+            if self._conn is not None and not self._conn.is_closed():
                 return self._conn
             try:
-                self._conn = await asyncssh.connect(
+                conn = await asyncssh.connect(
                     self._host,
                     port=self._port,
                     username=self._username,
                     password=self._password,
                     known_hosts=None,
                     server_host_key_algs=["ssh-rsa", "ssh-ed25519", "ssh-dss"],
+                    keepalive_interval=KEEPALIVE_INTERVAL,
                 )
             except (asyncssh.Error, OSError) as err:
                 raise NxSSHError(str(err)) from err
-        return self._conn
+            self._conn = conn
+            return conn
 
     async def close(self) -> None:
         """Close the SSH connection."""
@@ -83,41 +114,55 @@ class NxSSHClient:
             raise NxSSHError("Command execution failed")
         return result.stdout or ""
 
-    async def async_get_dhcp_hosts(self) -> List[Dict[str, str]]:
-        output = await self.async_run_command("uci show dhcp 2>/dev/null || true")
-        return parse_dhcp_hosts(output)
-
-    async def async_get_dhcp_leases(self) -> List[Dict[str, str]]:
-        output = await self.async_run_command("cat /tmp/dhcp.leases 2>/dev/null || true")
-        return parse_dhcp_leases(output)
-
-    async def async_get_odhcpd_leases(self) -> List[Dict[str, str]]:
-        output = await self.async_run_command("cat /tmp/odhcpd.leases 2>/dev/null || true")
-        return parse_odhcpd_leases(output)
+    async def async_run_batch(self, commands: Sequence[str]) -> List[str]:
+        """Run several commands over one SSH channel and return each stdout."""
 
-    async def async_get_neighbors(self) -> List[NeighborEntry]:
-        output = await self.async_run_command(
-            "ip neigh show 2>/dev/null || cat /proc/net/arp 2>/dev/null || true"
-        )
-        return parse_neighbors(output)
+        if not commands:
+            return []
+        output = await self.async_run_command(f"; echo {BATCH_SEPARATOR}; ".join(commands))
+        chunks = output.split(f"{BATCH_SEPARATOR}\n")
+        if len(chunks) != len(commands):
+            raise NxSSHError("Unexpected batch output")
+        return chunks
 
     async def async_get_wifi_interfaces(self) -> Set[str]:
-        output = await self.async_run_command("iwinfo 2>/dev/null || true")
-        interfaces = parse_iwinfo_interfaces(output)
-        if interfaces:
-            return interfaces
-        alt_output = await self.async_run_command("iw dev 2>/dev/null || true")
-        return parse_iw_dev_interfaces(alt_output)
-
-    async def async_get_wifi_clients(self, interface: str) -> List[WifiClient]:
-        output = await self.async_run_command(
-            f"iwinfo {interface} assoclist 2>/dev/null || true"
+        """Return wireless interfaces, trying the last working tool first."""
+
+        parsers = {
+            IWINFO_COMMAND: parse_iwinfo_interfaces,
+            IW_DEV_COMMAND: parse_iw_dev_interfaces,
+        }
+        order = [IWINFO_COMMAND, IW_DEV_COMMAND]
+        if self._wifi_discovery == IW_DEV_COMMAND:
+            order.reverse()
+        for command in order:
+            output = await self.async_run_command(command)
+            interfaces = parsers[command](output)
+            if interfaces:
+                self._wifi_discovery = command
+                return interfaces
+        self._wifi_discovery = None
+        return set()
+
+    async def async_get_wifi_clients(self, interfaces: Iterable[str]) -> List[WifiClient]:
+        """Return associated stations for all interfaces in a single batch."""
+
+        interfaces = list(interfaces)
+        outputs = await self.async_run_batch(
+            [ASSOCLIST_COMMAND.format(interface=interface) for interface in interfaces]
         )
-        return parse_wifi_assoclist(output, interface)
+        clients: List[WifiClient] = []
+        for interface, output in zip(interfaces, outputs):
+            clients.extend(parse_wifi_assoclist(output, interface))
+        return clients
 
 
+@lru_cache(maxsize=1024)
 def normalize_mac(mac: str) -> Optional[str]:
-    match = MAC_REGEX.search(mac or "")
+    candidate = (mac or "").strip()
+    if MAC_STRICT_REGEX.fullmatch(candidate):
+        return candidate.translate(MAC_SEPARATORS).upper()
+    match = MAC_REGEX.search(candidate)
     if not match:
         return None
     parts = match.group(0).replace("-", ":").split(":")
@@ -133,7 +178,7 @@ def parse_dhcp_hosts(output: str) -> List[Dict[str, str]]:
         if len(key_val) != 2:
             continue
         path, value = key_val
-        match = re.search(r"host\[(\d+)\]\.([^.]+)", path)
+        match = HOST_FIELD_REGEX.search(path)
         if not match:
             continue
         idx = match.group(1)
@@ -141,43 +186,29 @@ def parse_dhcp_hosts(output: str) -> List[Dict[str, str]]:
         value = value.strip().strip("'\"")
         host = hosts.setdefault(idx, {})
         host[field] = value
-    results = []
-    for host in hosts.values():
-        mac = normalize_mac(host.get("mac", ""))
-        if not mac:
-            continue
-        results.append(
-            {
-                "mac": mac,
-                "ip": host.get("ip"),
-                "hostname": host.get("name"),
-                "source": "static",
-            }
-        )
-    return results
+    return [
+        {
+            "mac": mac,
+            "ip": host.get("ip"),
+            "hostname": host.get("name"),
+            "source": "static",
+        }
+        for host in hosts.values()
+        if (mac := normalize_mac(host.get("mac", "")))
+    ]
 
 
 def parse_dhcp_leases(output: str) -> List[Dict[str, str]]:
-    leases: List[Dict[str, str]] = []
-    for line in output.splitlines():
-        if not line.strip():
-            continue
-        parts = line.split()
-        if len(parts) < 4:
-            continue
-        _, mac_raw, ip, hostname = parts[:4]
-        mac = normalize_mac(mac_raw)
-        if not mac:
-            continue
-        leases.append(
-            {
-                "mac": mac,
-                "ip": ip,
-                "hostname": hostname if hostname != "*" else None,
-                "source": "dynamic",
-            }
-        )
-    return leases
+    return [
+        {
+            "mac": mac,
+            "ip": parts[2],
+            "hostname": parts[3] if parts[3] != "*" else None,
+            "source": "dynamic",
+        }
+        for parts in map(str.split, output.splitlines())
+        if len(parts) >= 4 and (mac := normalize_mac(parts[1]))
+    ]
 
 
 def parse_odhcpd_leases(output: str) -> List[Dict[str, str]]:
@@ -190,12 +221,13 @@ def parse_odhcpd_leases(output: str) -> List[Dict[str, str]]:
         hostname = None
         ipv6 = None
         for part in parts:
-            if not ipv6 and ":" in part and not MAC_REGEX.fullmatch(part):
-                ipv6 = part
-            if not hostname and part.isascii() and ":" not in part and not MAC_REGEX.fullmatch(part):
-                hostname = part
             if MAC_REGEX.fullmatch(part):
                 mac = normalize_mac(part)
+            elif ":" in part:
+                if not ipv6:
+                    ipv6 = part
+            elif not hostname and part.isascii():
+                hostname = part
         if mac:
             leases.append(
                 {
@@ -211,41 +243,23 @@ def parse_odhcpd_leases(output: str) -> List[Dict[str, str]]:
 def parse_neighbors(output: str) -> List[NeighborEntry]:
     neighbors: List[NeighborEntry] = []
     for line in output.splitlines():
-        if not line.strip():
-            continue
-        if "ip neigh" in line or line.startswith("IP address"):
+        match = NEIGHBOR_REGEX.match(line)
+        if not match:
             continue
-        parts = line.split()
-        mac: Optional[str] = None
-        ip: Optional[str] = None
-        interface: Optional[str] = None
-        if "dev" in parts:
-            dev_index = parts.index("dev")
-            if dev_index + 1 < len(parts):
-                interface = parts[dev_index + 1]
-        if "lladdr" in parts:
-            mac_index = parts.index("lladdr")
-            if mac_index + 1 < len(parts):
-                mac = normalize_mac(parts[mac_index + 1])
-        if not mac and len(parts) >= 6 and MAC_REGEX.fullmatch(parts[3]):
-            mac = normalize_mac(parts[3])
-        if parts:
-            ip_candidate = parts[0]
-            if ip_candidate[0].isdigit() or ":" in ip_candidate:
-                ip = ip_candidate
-        if mac and ip:
-            neighbors.append(NeighborEntry(mac=mac, ip=ip, interface=interface))
+        mac = normalize_mac(match["mac"] or match["arp_mac"])
+        if mac:
+            neighbors.append(
+                NeighborEntry(mac=mac, ip=match["ip"], interface=match["dev"] or match["arp_dev"])
+            )
     return neighbors
 
 
 def parse_iwinfo_interfaces(output: str) -> Set[str]:
     interfaces: Set[str] = set()
     for line in output.splitlines():
-        if not line.strip():
+        if not line or line[0].isspace():
             continue
-        iface = line.split()[0]
-        if iface:
-            interfaces.add(iface)
+        interfaces.add(line.split(maxsplit=1)[0])
     return interfaces
 
 
@@ -268,11 +282,14 @@ def parse_wifi_assoclist(output: str, interface: str) -> List[WifiClient]:
         mac = normalize_mac(match.group(0))
         if not mac:
             continue
-        signal_match = re.search(r"(-?\d+)\s*dBm", line)
+        signal_match = SIGNAL_REGEX.search(line)
         signal = int(signal_match.group(1)) if signal_match else None
         clients.append(WifiClient(mac=mac, interface=interface, signal_dbm=signal))
     return clients
 
 
-def utcnow_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+def utcnow_iso(resolution: Optional[timedelta] = None) -> str:
+    now = datetime.now(timezone.utc)
+    if resolution:
+        now -= (now - EPOCH) % resolution
+    return now.isoformat()
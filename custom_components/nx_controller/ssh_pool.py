@@ -0,0 +1,37 @@
+"""Hand-off of validated SSH sessions for NxController."""
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DATA_SSH_POOL, DOMAIN
+from .ssh_client import NxSSHClient
+
+PoolKey = Tuple[str, int, str, str]
+
+
+def _pool(hass: HomeAssistant) -> Dict[PoolKey, NxSSHClient]:
+    return hass.data.setdefault(DOMAIN, {}).setdefault(DATA_SSH_POOL, {})
+
+
+@callback
+def async_acquire(
+    hass: HomeAssistant, host: str, port: int, username: str, password: str
+) -> NxSSHClient:
+    """Return a parked client for the credentials or a fresh one."""
+
+    client = _pool(hass).pop((host, port, username, password), None)
+    if client is not None:
+        return client
+    return NxSSHClient(host, port, username, password)
+
+
+async def async_release(hass: HomeAssistant, client: NxSSHClient) -> None:
+    """Park a connected client so the next acquire reuses its session."""
+
+    pool = _pool(hass)
+    previous = pool.pop(client.credentials, None)
+    if previous is not None and previous is not client:
+        await previous.close()
+    pool[client.credentials] = client